@@ -3,10 +3,12 @@ RAG Chat Application — Streamlit UI
 Chat with your enterprise documents using Retrieval-Augmented Generation.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 from ingest import ingest_files, SUPPORTED_EXTENSIONS
 from vector_store import add_documents, search, get_document_count, clear
-from rag_chain import generate_answer
+from rag_chain import extract_sources, invalidate_caches, stream_answer
 
 # ---------------------------------------------------------------------------
 # Page Configuration
@@ -156,6 +158,9 @@ with st.sidebar:
                         # Store in Chroma
                         add_documents(documents)
 
+                        # Cached answers predate the new documents
+                        invalidate_caches()
+
                         st.session_state.documents_loaded = True
                         st.session_state.file_names = [f.name for f in uploaded_files]
 
@@ -185,6 +190,7 @@ with st.sidebar:
     # Clear Knowledge Base
     if st.button("🗑️ Clear Knowledge Base", use_container_width=True):
         clear()
+        invalidate_caches()
         st.session_state.chat_history = []
         st.session_state.documents_loaded = False
         st.session_state.file_names = []
@@ -238,38 +244,38 @@ if prompt := st.chat_input("Ask a question about your documents..."):
 
         # Retrieve relevant chunks
         with st.chat_message("assistant"):
-            with st.spinner("🔍 Searching documents and generating answer..."):
-                # Semantic search
-                retrieved_docs = search(prompt, k=5)
-
-                # Build conversation history for the LLM
-                history_for_llm = [
-                    (entry["role"], entry["content"])
-                    for entry in st.session_state.chat_history
-                ]
-
-                # Generate answer
-                result = generate_answer(
-                    question=prompt,
-                    retrieved_docs=retrieved_docs,
-                    chat_history=history_for_llm,
-                    mode=st.session_state.mode,
-                )
-
-                # Display answer
-                st.markdown(result["answer"])
-
-                # Display sources
-                if result["sources"]:
-                    with st.expander(f"📎 Sources ({len(result['sources'])} references)", expanded=False):
-                        for src in result["sources"]:
-                            source_info = f"📄 **{src['source']}**"
-                            if "page" in src:
-                                source_info += f" — Page {src['page']}"
-                            if "chunk" in src:
-                                source_info += f", Chunk {src['chunk']}"
-                            snippet = src.get('snippet', '')
-                            st.info(f"{source_info}\n\n_{snippet}_")
+            with st.spinner("🔍 Searching documents..."):
+                # Kick off the semantic search and build the conversation
+                # history while it runs — the ONNX embedding releases the
+                # GIL, so the string work overlaps with retrieval.
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    search_future = executor.submit(search, prompt, 5)
+                    history_for_llm = [
+                        (entry["role"], entry["content"])
+                        for entry in st.session_state.chat_history
+                    ]
+                    retrieved_docs = search_future.result()
+
+            # Stream the answer token-by-token as it arrives
+            answer = st.write_stream(stream_answer(
+                question=prompt,
+                retrieved_docs=retrieved_docs,
+                chat_history=history_for_llm,
+                mode=st.session_state.mode,
+            ))
+
+            # Display sources
+            sources = extract_sources(retrieved_docs)
+            if sources:
+                with st.expander(f"📎 Sources ({len(sources)} references)", expanded=False):
+                    for src in sources:
+                        source_info = f"📄 **{src['source']}**"
+                        if "page" in src:
+                            source_info += f" — Page {src['page']}"
+                        if "chunk" in src:
+                            source_info += f", Chunk {src['chunk']}"
+                        snippet = src.get('snippet', '')
+                        st.info(f"{source_info}\n\n_{snippet}_")
 
         # Save to chat history
         st.session_state.chat_history.append({
@@ -278,8 +284,8 @@ if prompt := st.chat_input("Ask a question about your documents..."):
         })
         st.session_state.chat_history.append({
             "role": "assistant",
-            "content": result["answer"],
-            "sources": result["sources"],
+            "content": answer,
+            "sources": sources,
         })
 
 # ---------------------------------------------------------------------------
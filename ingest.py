@@ -3,22 +3,154 @@ Document Ingestion Module
 Handles parsing of PDF, DOCX, and CSV files into chunked LangChain Documents.
 """
 
+import io
 import os
-import pandas as pd
-from docx import Document as DocxDocument
-from pypdf import PdfReader
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# pandas, python-docx and pypdf are deliberately NOT imported at module load:
+# together they add ~1s and substantial RSS to Streamlit's cold start, and a
+# given session usually touches only one format. Each loader imports its own
+# parser on first use; Python caches it after that.
 
 
 # ---------------------------------------------------------------------------
 # Text Splitter — shared across all file types
 # ---------------------------------------------------------------------------
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=100,
-    separators=["\n\n", "\n", ". ", " ", ""],
-)
+
+# All separators compiled into one alternation, so a single linear regex scan
+# finds every legal break point instead of one recursive walk per separator
+# (RecursiveCharacterTextSplitter does O(separators * n) passes).
+_SEPARATORS = ["\n\n", "\n", ". ", " "]
+_SEPARATOR_RE = re.compile("|".join(re.escape(sep) for sep in _SEPARATORS))
+
+
+def _pack_chunks(breaks, n, size, overlap):
+    """
+    Greedily pack break offsets into chunk windows.
+
+    Pure numeric loop over an int32 array so Numba can lower it to machine
+    code (no strings cross the boundary — the caller slices the text).
+
+    Parameters
+    ----------
+    breaks : np.ndarray
+        Sorted int32 array of legal break offsets from the separator scan.
+    n : int
+        Length of the text.
+    size, overlap : int
+        Chunk window size and overlap carried between consecutive chunks.
+
+    Returns
+    -------
+    np.ndarray
+        (n_chunks, 2) int32 array of [start, end) offsets.
+    """
+    # Pass 1: count chunks so the output array can be allocated exactly
+    count = 0
+    start = 0
+    last_end = 0
+    while start < n:
+        count += 1
+        limit = start + size
+        if limit >= n:
+            break
+        end = limit
+        idx = np.searchsorted(breaks, limit, side="right") - 1
+        if idx >= 0 and breaks[idx] > start and breaks[idx] > last_end:
+            end = breaks[idx]
+        last_end = end
+        next_start = end - overlap
+        start = next_start if next_start > start else end
+
+    # Pass 2: fill the bounds
+    bounds = np.empty((count, 2), dtype=np.int32)
+    i = 0
+    start = 0
+    last_end = 0
+    while start < n:
+        limit = start + size
+        if limit >= n:
+            bounds[i, 0] = start
+            bounds[i, 1] = n
+            break
+        end = limit
+        idx = np.searchsorted(breaks, limit, side="right") - 1
+        if idx >= 0 and breaks[idx] > start and breaks[idx] > last_end:
+            end = breaks[idx]
+        bounds[i, 0] = start
+        bounds[i, 1] = end
+        i += 1
+        last_end = end
+        next_start = end - overlap
+        start = next_start if next_start > start else end
+    return bounds
+
+
+try:
+    # JIT the packer when Numba is installed — near C-speed chunking on long
+    # documents. The pure-Python fallback keeps the app working without it.
+    import numba
+
+    _pack_chunks = numba.njit(cache=True)(_pack_chunks)
+except ImportError:
+    pass
+
+
+class FastTextSplitter:
+    """
+    Single-pass replacement for RecursiveCharacterTextSplitter.
+
+    One compiled-regex scan collects every separator position in the text,
+    then a greedy packer emits windows of at most ``chunk_size`` characters
+    with ``chunk_overlap`` carried between consecutive chunks, preferring to
+    end each chunk on a separator and falling back to a hard cut when none
+    fits (the old splitter's "" separator).
+    """
+
+    def __init__(self, chunk_size=500, chunk_overlap=100):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text):
+        """Split text into overlapping chunks of at most chunk_size chars."""
+        n = len(text)
+        if n <= self.chunk_size:
+            stripped = text.strip()
+            return [stripped] if stripped else []
+
+        # Legal break offsets — the end of every separator match
+        breaks = np.array(
+            [match.end() for match in _SEPARATOR_RE.finditer(text)],
+            dtype=np.int32,
+        )
+        bounds = _pack_chunks(breaks, n, self.chunk_size, self.chunk_overlap)
+
+        chunks = []
+        for start, end in bounds:
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def create_documents(self, texts, metadatas=None):
+        """Split each text and wrap the chunks in Documents with metadata."""
+        documents = []
+        for i, text in enumerate(texts):
+            metadata = metadatas[i] if metadatas else {}
+            for chunk in self.split_text(text):
+                documents.append(Document(page_content=chunk, metadata=dict(metadata)))
+        return documents
+
+
+text_splitter = FastTextSplitter(chunk_size=500, chunk_overlap=100)
 
 
 # ---------------------------------------------------------------------------
@@ -27,27 +159,51 @@ text_splitter = RecursiveCharacterTextSplitter(
 
 def _load_pdf(file) -> list[Document]:
     """Parse a PDF file and return chunked Documents with page metadata."""
-    reader = PdfReader(file)
-    documents = []
+    from pypdf import PdfReader
+
+    # strict=False: tolerate minor spec violations instead of raising —
+    # they don't affect text extraction.
+    reader = PdfReader(file, strict=False)
+
+    # Extract all page texts first, then split everything in one call —
+    # per-page split_text pays the splitter's setup cost once per page.
+    # Extraction stays sequential: pypdf resolves indirect objects lazily by
+    # seeking on the one shared stream, so threading pages of a single
+    # reader corrupts output. Cross-file parallelism lives in ingest_files.
+    page_texts = []
     for page_num, page in enumerate(reader.pages, start=1):
+        # A page without a content stream has no text — skip the
+        # extraction machinery entirely
+        if page.get("/Contents") is None:
+            continue
         text = page.extract_text()
         if text and text.strip():
-            chunks = text_splitter.split_text(text)
-            for idx, chunk in enumerate(chunks):
-                documents.append(Document(
-                    page_content=chunk,
-                    metadata={
-                        "source": file.name,
-                        "page": page_num,
-                        "chunk": idx + 1,
-                        "type": "pdf",
-                    },
-                ))
+            page_texts.append((page_num, text))
+
+    if not page_texts:
+        return []
+
+    documents = text_splitter.create_documents(
+        texts=[text for _, text in page_texts],
+        metadatas=[
+            {"source": file.name, "page": page_num, "type": "pdf"}
+            for page_num, _ in page_texts
+        ],
+    )
+
+    # Number the chunks within each page, matching the old per-page output
+    chunk_counts = {}
+    for doc in documents:
+        page_num = doc.metadata["page"]
+        chunk_counts[page_num] = chunk_counts.get(page_num, 0) + 1
+        doc.metadata["chunk"] = chunk_counts[page_num]
     return documents
 
 
 def _load_docx(file) -> list[Document]:
     """Parse a DOCX file and return chunked Documents."""
+    from docx import Document as DocxDocument
+
     doc = DocxDocument(file)
     full_text = "\n".join(para.text for para in doc.paragraphs if para.text.strip())
     if not full_text.strip():
@@ -69,13 +225,17 @@ def _load_docx(file) -> list[Document]:
 
 def _load_csv(file) -> list[Document]:
     """Parse a CSV file and return chunked Documents (one per row group)."""
+    import pandas as pd
+
     df = pd.read_csv(file)
-    # Convert each row to a readable string representation
-    rows_text = []
+    # Convert each row to a readable string representation. itertuples yields
+    # plain tuples about an order of magnitude faster than iterrows, which
+    # builds a Series per row.
     columns = df.columns.tolist()
-    for row_idx, row in df.iterrows():
-        row_str = " | ".join(f"{col}: {val}" for col, val in zip(columns, row.values))
-        rows_text.append(row_str)
+    rows_text = [
+        " | ".join(f"{col}: {val}" for col, val in zip(columns, row))
+        for row in df.itertuples(index=False, name=None)
+    ]
 
     # Join rows and then chunk
     full_text = "\n".join(rows_text)
@@ -129,10 +289,26 @@ def ingest_file(file) -> list[Document]:
     return loader(file)
 
 
+def _ingest_one_bytes(name_and_data) -> list[Document]:
+    """
+    Ingest a single file from (name, raw bytes) — used by worker processes.
+
+    Streamlit's UploadedFile isn't picklable, so parallel workers receive the
+    file name plus raw bytes and rebuild a file-like object here.
+    """
+    name, data = name_and_data
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return ingest_file(buffer)
+
+
 def ingest_files(files) -> list[Document]:
     """
     Ingest multiple uploaded files and return all chunked Documents.
 
+    Files are parsed in parallel across CPU cores — PDF text extraction is
+    CPU-heavy, so a 10-file upload takes roughly as long as its largest file.
+
     Parameters
     ----------
     files : list[streamlit.UploadedFile]
@@ -143,7 +319,24 @@ def ingest_files(files) -> list[Document]:
     list[Document]
         Combined chunked documents from all files.
     """
+    if not files:
+        return []
+    if len(files) == 1:
+        return ingest_file(files[0])
+
+    payloads = [(file.name, file.getvalue()) for file in files]
+    max_workers = min(len(files), os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_ingest_one_bytes, payloads))
+    except (BrokenProcessPool, pickle.PicklingError):
+        # Only pool-machinery failures (e.g. forking/pickling unavailable on
+        # some Windows setups) fall back to threads — per-file parse errors
+        # propagate to the caller instead of being re-raised after a retry.
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_ingest_one_bytes, payloads))
+
     all_docs = []
-    for file in files:
-        all_docs.extend(ingest_file(file))
+    for docs in results:
+        all_docs.extend(docs)
     return all_docs
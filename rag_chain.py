@@ -4,10 +4,14 @@ Handles LLM interaction with strict/hybrid mode prompt templates and source cita
 """
 
 import os
+
+import numpy as np
 import streamlit as st
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
 
+from vector_store import _embed_query
+
 load_dotenv()
 
 # ---------------------------------------------------------------------------
@@ -46,11 +50,76 @@ RULES:
 5. When citing information from documents, mention the source document name."""
 
 
+# ---------------------------------------------------------------------------
+# Semantic Answer Cache
+# ---------------------------------------------------------------------------
+# RAG workloads see heavy query repetition; a semantically identical question
+# shouldn't pay the full Inference API round trip again. Cache prior answers
+# keyed by question embedding and return the cached one when cosine similarity
+# exceeds the threshold.
+_QA_CACHE_MAX_ENTRIES = 512
+_QA_CACHE_SIMILARITY_THRESHOLD = 0.95
+
+# Ring buffer of (unit-norm np.float32[384], answer, sources, mode) tuples
+_qa_cache = []
+
+
+def _normalize(embedding):
+    """Return the embedding scaled to unit length (for cosine via dot product)."""
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm > 0 else embedding
+
+
+def _qa_cache_lookup(q_emb, mode):
+    """Return a cached (answer, sources) for a near-identical question, or None."""
+    entries = [e for e in _qa_cache if e[3] == mode]
+    if not entries:
+        return None
+    # Stack cached embeddings into one contiguous matrix so the similarity
+    # scan is a single BLAS matrix-vector product, not a Python loop.
+    cache_matrix = np.stack([e[0] for e in entries])
+    similarities = cache_matrix @ q_emb
+    best = int(np.argmax(similarities))
+    if similarities[best] >= _QA_CACHE_SIMILARITY_THRESHOLD:
+        return entries[best][1], entries[best][2]
+    return None
+
+
+def _qa_cache_store(q_emb, answer, sources, mode):
+    """Append an answer to the cache, evicting the oldest entry when full."""
+    if len(_qa_cache) >= _QA_CACHE_MAX_ENTRIES:
+        _qa_cache.pop(0)
+    _qa_cache.append((q_emb, answer, sources, mode))
+
+
+# Memoized context strings keyed by the retrieved chunks' identity — chat
+# turns frequently retrieve overlapping top-k sets, and rebuilding the joined
+# string each turn is wasted allocation. Capped dict, oldest entry evicted.
+_context_cache = {}
+_CONTEXT_CACHE_MAX_ENTRIES = 256
+
+
 def _build_context_string(retrieved_docs):
     """Format retrieved document chunks into a readable context string."""
     if not retrieved_docs:
         return "No relevant documents found."
 
+    # Key on content identity as well as location — after a re-upload of an
+    # edited file, old and new chunks can share (source, page, chunk)
+    # metadata, and a metadata-only key would serve stale chunk text.
+    cache_key = tuple(
+        (
+            doc.metadata.get("source", ""),
+            doc.metadata.get("page", ""),
+            doc.metadata.get("chunk", ""),
+            hash(doc.page_content),
+        )
+        for doc in retrieved_docs
+    )
+    cached = _context_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     context_parts = []
     for i, doc in enumerate(retrieved_docs, 1):
         source = doc.metadata.get("source", "Unknown")
@@ -65,7 +134,11 @@ def _build_context_string(retrieved_docs):
 
         context_parts.append(f"[{i}] {location}\n{doc.page_content}")
 
-    return "\n\n---\n\n".join(context_parts)
+    context_string = "\n\n---\n\n".join(context_parts)
+    if len(_context_cache) >= _CONTEXT_CACHE_MAX_ENTRIES:
+        _context_cache.pop(next(iter(_context_cache)))
+    _context_cache[cache_key] = context_string
+    return context_string
 
 
 def _format_chat_history(chat_history, max_turns=5):
@@ -81,7 +154,25 @@ def _format_chat_history(chat_history, max_turns=5):
     return messages
 
 
-def _extract_sources(retrieved_docs):
+def _build_messages(question, retrieved_docs, chat_history, mode):
+    """Assemble the full message list for the LLM call."""
+    system_prompt = STRICT_SYSTEM_PROMPT if mode == "strict" else HYBRID_SYSTEM_PROMPT
+    context_string = _build_context_string(retrieved_docs)
+
+    user_message = f"""Document Context:
+{context_string}
+
+Question: {question}
+
+Please provide a detailed answer based on the above context."""
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(_format_chat_history(chat_history))
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def extract_sources(retrieved_docs):
     """Extract unique source citations from retrieved documents."""
     sources = []
     seen = set()
@@ -89,19 +180,21 @@ def _extract_sources(retrieved_docs):
         source = doc.metadata.get("source", "Unknown")
         page = doc.metadata.get("page", "")
         chunk = doc.metadata.get("chunk", "")
-        doc_type = doc.metadata.get("type", "")
-
-        key = f"{source}-p{page}-c{chunk}"
-        if key not in seen:
-            seen.add(key)
-            citation = {"source": source, "type": doc_type}
-            if page:
-                citation["page"] = page
-            if chunk:
-                citation["chunk"] = chunk
-            # Include a snippet of the content for reference
-            citation["snippet"] = doc.page_content[:150] + "..." if len(doc.page_content) > 150 else doc.page_content
-            sources.append(citation)
+
+        # Tuple key — no throwaway string allocation per duplicate
+        key = (source, page, chunk)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        citation = {"source": source, "type": doc.metadata.get("type", "")}
+        if page:
+            citation["page"] = page
+        if chunk:
+            citation["chunk"] = chunk
+        # Include a snippet of the content for reference
+        citation["snippet"] = doc.page_content[:150] + ("..." if len(doc.page_content) > 150 else "")
+        sources.append(citation)
     return sources
 
 
@@ -109,6 +202,18 @@ def _extract_sources(retrieved_docs):
 # Public API
 # ---------------------------------------------------------------------------
 
+def invalidate_caches():
+    """
+    Drop all cached answers and context strings.
+
+    Must be called whenever the document corpus changes (upload or clear) —
+    cached answers were generated against the old corpus and would otherwise
+    be replayed for repeat questions.
+    """
+    _qa_cache.clear()
+    _context_cache.clear()
+
+
 def generate_answer(question, retrieved_docs, chat_history=None, mode="strict"):
     """
     Generate an answer using the LLM with retrieved document context.
@@ -132,29 +237,15 @@ def generate_answer(question, retrieved_docs, chat_history=None, mode="strict"):
     if chat_history is None:
         chat_history = []
 
-    # Select prompt based on mode
-    system_prompt = STRICT_SYSTEM_PROMPT if mode == "strict" else HYBRID_SYSTEM_PROMPT
-
-    # Build context from retrieved docs
-    context_string = _build_context_string(retrieved_docs)
+    # Check the semantic cache first — a near-identical prior question
+    # skips the LLM call entirely.
+    q_emb = _normalize(_embed_query(question))
+    cached = _qa_cache_lookup(q_emb, mode)
+    if cached is not None:
+        answer, sources = cached
+        return {"answer": answer, "sources": sources}
 
-    # Build the user message with context
-    user_message = f"""Document Context:
-{context_string}
-
-Question: {question}
-
-Please provide a detailed answer based on the above context."""
-
-    # Construct messages list
-    messages = [{"role": "system", "content": system_prompt}]
-
-    # Add chat history for conversational context
-    history_messages = _format_chat_history(chat_history)
-    messages.extend(history_messages)
-
-    # Add current question with context
-    messages.append({"role": "user", "content": user_message})
+    messages = _build_messages(question, retrieved_docs, chat_history, mode)
 
     # Call LLM
     try:
@@ -165,10 +256,63 @@ Please provide a detailed answer based on the above context."""
             temperature=0.3 if mode == "strict" else 0.5,
         )
         answer = response.choices[0].message.content
+        llm_succeeded = True
     except Exception as e:
         answer = f"❌ Error generating response: {str(e)}"
+        llm_succeeded = False
 
     # Extract source citations
-    sources = _extract_sources(retrieved_docs)
+    sources = extract_sources(retrieved_docs)
+
+    # Only cache real answers — errors should be retried, not replayed
+    if llm_succeeded:
+        _qa_cache_store(q_emb, answer, sources, mode)
 
     return {"answer": answer, "sources": sources}
+
+
+def stream_answer(question, retrieved_docs, chat_history=None, mode="strict"):
+    """
+    Stream an answer token-by-token using the LLM with retrieved context.
+
+    Same inputs as generate_answer, but yields answer fragments as they
+    arrive so the UI can render them incrementally (e.g. st.write_stream) —
+    perceived latency drops to time-to-first-token. Cached answers from the
+    semantic cache are yielded in one piece.
+
+    Yields
+    ------
+    str
+        Consecutive fragments of the answer text.
+    """
+    if chat_history is None:
+        chat_history = []
+
+    q_emb = _normalize(_embed_query(question))
+    cached = _qa_cache_lookup(q_emb, mode)
+    if cached is not None:
+        yield cached[0]
+        return
+
+    messages = _build_messages(question, retrieved_docs, chat_history, mode)
+
+    pieces = []
+    try:
+        stream = client.chat.completions.create(
+            model=MODEL_ID,
+            messages=messages,
+            max_tokens=1024,
+            temperature=0.3 if mode == "strict" else 0.5,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                pieces.append(delta)
+                yield delta
+    except Exception as e:
+        yield f"❌ Error generating response: {str(e)}"
+        return
+
+    # Cache the completed answer for semantically identical follow-ups
+    _qa_cache_store(q_emb, "".join(pieces), extract_sources(retrieved_docs), mode)
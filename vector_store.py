@@ -4,8 +4,14 @@ Handles Chroma DB operations: initialization, document storage, and semantic sea
 Uses Chroma's built-in ONNX embedding (no PyTorch needed).
 """
 
+import functools
+import hashlib
 import os
+import pickle
+import time
+
 import chromadb
+import numpy as np
 from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 from langchain_core.documents import Document
 
@@ -15,19 +21,166 @@ from langchain_core.documents import Document
 CHROMA_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
 COLLECTION_NAME = "rag_documents"
 
-# Chroma's built-in embedding — uses ONNX MiniLM-L6-v2 (no torch required)
-_embedding_fn = DefaultEmbeddingFunction()
+# HNSW index tuning — sized for the ~10k-100k chunk collections this app
+# sees. search_ef=64 (vs Chroma's default 10) buys recall@5 at the same
+# query latency; override via env vars for larger corpora. Like hnsw:space,
+# these apply when the collection is created.
+HNSW_M = int(os.environ.get("HNSW_M", 16))
+HNSW_CONSTRUCTION_EF = int(os.environ.get("HNSW_CONSTRUCTION_EF", 100))
+HNSW_SEARCH_EF = int(os.environ.get("HNSW_SEARCH_EF", 64))
+
+# Chroma's built-in embedding — uses ONNX MiniLM-L6-v2 (no torch required).
+# Where possible, swap the FP32 session for a dynamically INT8-quantized one:
+# ~2x embedding throughput on CPUs with int8 dot-product support, with
+# negligible recall loss for sentence embeddings.
+try:
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+    class _QuantizedMiniLM(ONNXMiniLM_L6_V2):
+        """MiniLM embedder running an INT8-quantized ONNX session."""
+
+        def _init_model_and_tokenizer(self):
+            super()._init_model_and_tokenizer()
+            # Chroma calls this on every embed, relying on the parent's
+            # "model is None" guard — mirror that idempotency here so the
+            # INT8 session is built once, not per call. The flag is set even
+            # on failure: a broken quantization shouldn't be retried per
+            # embed either.
+            if getattr(self, "_int8_loaded", False):
+                return
+            self._int8_loaded = True
+            try:
+                import onnxruntime as ort
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                model_dir = os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME)
+                fp32_path = os.path.join(model_dir, "model.onnx")
+                int8_path = os.path.join(model_dir, "model.int8.onnx")
+                # Quantize once; reuse the cached artifact on later starts
+                if not os.path.exists(int8_path):
+                    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                options.intra_op_num_threads = os.cpu_count() or 1
+                self.model = ort.InferenceSession(
+                    int8_path,
+                    sess_options=options,
+                    providers=["CPUExecutionProvider"],
+                )
+            except Exception:
+                # Keep the FP32 session the parent already set up
+                pass
 
+    _embedding_fn = _QuantizedMiniLM()
+except Exception:
+    _embedding_fn = DefaultEmbeddingFunction()
 
+
+@functools.lru_cache(maxsize=1)
 def _get_collection():
-    """Return the Chroma collection, creating it if needed."""
+    """
+    Return the Chroma collection, creating it if needed.
+
+    The client and collection handle are cached for the life of the process —
+    PersistentClient is thread-safe, and reinstantiating it per call re-opens
+    SQLite and re-verifies the HNSW index every time.
+    """
     client = chromadb.PersistentClient(path=CHROMA_DIR)
     return client.get_or_create_collection(
         name=COLLECTION_NAME,
         embedding_function=_embedding_fn,
+        # MiniLM embeddings come out unit-normalized, so inner product ranks
+        # identically to cosine while skipping the per-comparison
+        # normalization inside the HNSW graph walk. Applies on collection
+        # creation only — an existing chroma_db keeps its configured space.
+        metadata={
+            "hnsw:space": "ip",
+            "hnsw:M": HNSW_M,
+            "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": HNSW_SEARCH_EF,
+        },
     )
 
 
+# ---------------------------------------------------------------------------
+# Query Embedding Cache
+# ---------------------------------------------------------------------------
+# Chat users retry the same question often, and re-embedding a query through
+# the ONNX model costs tens of milliseconds every time. Cache embeddings keyed
+# by a hash of the normalized query (LRU eviction + TTL), persisted next to
+# the Chroma DB so the cache survives app restarts.
+_QUERY_CACHE_PATH = os.path.join(CHROMA_DIR, "query_emb_cache.pkl")
+_QUERY_CACHE_MAX_ENTRIES = 1024
+_QUERY_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# {sha256 hexdigest: (timestamp, np.float32[384])} — insertion order is LRU order
+_query_cache = None
+
+# Cached chunk count — Streamlit re-renders the sidebar on every rerun, and
+# each render was a SQL COUNT(*) roundtrip. The count only changes on
+# add_documents()/clear(), so refresh it there and serve reads from memory.
+_doc_count = None
+
+
+def _load_query_cache():
+    """Lazily load the persisted query cache (empty dict on first run)."""
+    global _query_cache
+    if _query_cache is None:
+        try:
+            with open(_QUERY_CACHE_PATH, "rb") as f:
+                _query_cache = pickle.load(f)
+        except Exception:
+            _query_cache = {}
+    return _query_cache
+
+
+def _save_query_cache(cache):
+    """Persist the query cache to disk — best effort, failures are ignored."""
+    try:
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        with open(_QUERY_CACHE_PATH, "wb") as f:
+            pickle.dump(cache, f)
+    except Exception:
+        pass
+
+
+def _embed_query(query):
+    """
+    Embed a query string, reusing cached embeddings for repeat questions.
+
+    Parameters
+    ----------
+    query : str
+        The user's question.
+
+    Returns
+    -------
+    np.ndarray
+        The 384-dim float32 embedding.
+    """
+    cache = _load_query_cache()
+    key = hashlib.sha256(query.strip().lower().encode()).hexdigest()
+    now = time.time()
+
+    entry = cache.get(key)
+    if entry is not None:
+        ts, embedding = entry
+        if now - ts < _QUERY_CACHE_TTL_SECONDS:
+            # Re-insert to refresh the LRU position
+            cache.pop(key)
+            cache[key] = (ts, embedding)
+            return embedding
+        del cache[key]
+
+    embedding = np.asarray(_embedding_fn([query])[0], dtype=np.float32)
+    cache[key] = (now, embedding)
+    while len(cache) > _QUERY_CACHE_MAX_ENTRIES:
+        cache.pop(next(iter(cache)))
+    _save_query_cache(cache)
+    return embedding
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -41,22 +194,47 @@ def add_documents(documents):
     documents : list[Document]
         Chunked documents from the ingestion module.
     """
+    if not documents:
+        return
+
     collection = _get_collection()
 
-    ids = [f"doc_{i}_{hash(doc.page_content) % 100000}" for i, doc in enumerate(documents)]
-    texts = [doc.page_content for doc in documents]
-    metadatas = [doc.metadata for doc in documents]
+    # Content-addressed IDs: BLAKE2b-128 of the chunk text is stable across
+    # restarts (unlike Python's randomized hash) and collision-free in
+    # practice, so re-uploading the same file upserts in place instead of
+    # duplicating chunks. Drop repeat chunks within the batch up front.
+    ids, texts, metadatas = [], [], []
+    seen = set()
+    for doc in documents:
+        doc_id = hashlib.blake2b(doc.page_content.encode(), digest_size=16).hexdigest()
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        ids.append(doc_id)
+        texts.append(doc.page_content)
+        metadatas.append(doc.metadata)
 
-    # Add in batches of 100 to avoid memory issues
-    batch_size = 100
+    # Embed everything in one wide ONNX call — the runtime amortizes graph
+    # setup and vectorizes across the batch, instead of re-entering the
+    # session once per Chroma batch.
+    all_embeddings = _embedding_fn(texts)
+
+    # Add in batches to keep individual Chroma writes bounded
+    batch_size = 512
     for start in range(0, len(texts), batch_size):
         end = start + batch_size
-        collection.add(
+        collection.upsert(
             ids=ids[start:end],
             documents=texts[start:end],
             metadatas=metadatas[start:end],
+            embeddings=[list(emb) for emb in all_embeddings[start:end]],
         )
 
+    # Re-read once after the write — upserts of existing chunks don't grow
+    # the collection, so the exact count comes from Chroma.
+    global _doc_count
+    _doc_count = collection.count()
+
 
 def search(query, k=5):
     """
@@ -82,7 +260,15 @@ def search(query, k=5):
     # Don't request more results than exist
     k = min(k, count)
 
-    results = collection.query(query_texts=[query], n_results=k)
+    # Embed the query ourselves (with caching) so Chroma skips its own
+    # embedding step on every call.
+    query_embedding = _embed_query(query)
+    results = collection.query(
+        query_embeddings=[query_embedding.tolist()],
+        n_results=k,
+        # Only pull what we use — skips serializing distances/embeddings
+        include=["documents", "metadatas"],
+    )
 
     documents = []
     for i in range(len(results["documents"][0])):
@@ -95,20 +281,25 @@ def search(query, k=5):
 
 def get_document_count():
     """Return the number of documents currently stored in the vector DB."""
-    try:
-        collection = _get_collection()
-        return collection.count()
-    except Exception:
-        return 0
+    global _doc_count
+    if _doc_count is None:
+        try:
+            _doc_count = _get_collection().count()
+        except Exception:
+            return 0
+    return _doc_count
 
 
 def clear():
     """Remove all documents from the Chroma DB collection."""
+    global _doc_count
     try:
-        collection = _get_collection()
-        # Get all IDs and delete them — avoids file lock issues on Windows
-        all_ids = collection.get()["ids"]
-        if all_ids:
-            collection.delete(ids=all_ids)
+        # Dropping the whole collection releases the HNSW segment in one go,
+        # instead of materializing every ID in Python and issuing a giant
+        # delete. The next _get_collection() call recreates it empty.
+        client = chromadb.PersistentClient(path=CHROMA_DIR)
+        client.delete_collection(COLLECTION_NAME)
+        _get_collection.cache_clear()
+        _doc_count = 0
     except Exception:
         pass